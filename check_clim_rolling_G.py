@@ -0,0 +1,75 @@
+'''
+
+Check of clim_calcs_rolling() (heatwave_functions_G.py), i.e. the incremental sorted-window slide and window percentile.
+
+For each year the threshold must match np.nanpercentile exactly and the mean must match np.nanmean (to rounding of the running sums) over the trailing window;
+year 0 must match clim_calcs().
+Run with: python check_clim_rolling_G.py
+
+'''
+
+#****************************************************************
+
+import io
+import contextlib
+import warnings
+import numpy as np
+import heatwave_functions_G
+
+#****************************************************************
+
+def test_field(num_years, n_lat, n_lon):
+
+    ''' SST field [time, lat, lon] with missing values (NaN), an all-NaN (land) cell and tied values '''
+
+    days_in_year = 365
+    rng = np.random.default_rng(0)
+    field = np.round(rng.normal(15., 2., (num_years * days_in_year, n_lat, n_lon)), 1) # rounding gives ties
+    field[rng.random(np.shape(field)) < 0.1] = np.nan # scattered missing values
+    field[:, 0, 0] = np.nan # land
+    field[0:2 * days_in_year, 1, 1] = np.nan # missing for whole years
+    field[:, 2, 2] = 10. # constant (all values tied)
+
+    return field
+
+def run_checks():
+
+    ''' compare clim_calcs_rolling() with direct window calculations; returns number of mismatches '''
+
+    days_in_year = 365
+    num_years = 8
+    pctile = 90
+    n_bad = 0
+    for num_yearsCLIM in [1, 3, 5]:
+        field = test_field(num_years, 3, 4)
+        with contextlib.redirect_stdout(io.StringIO()), warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning) # all-NaN slices
+            clim_thresh, clim_mean = heatwave_functions_G.clim_calcs_rolling(field, num_yearsCLIM, pctile)
+            years = np.reshape(field, (num_years, days_in_year) + np.shape(field)[1:])
+            for i in range(num_years):
+                start = max(0, i - num_yearsCLIM + 1)
+                window = years[start:start + num_yearsCLIM]
+                if not np.array_equal(clim_thresh[i], np.nanpercentile(window, pctile, axis=0), equal_nan=True):
+                    n_bad += 1
+                    print('MISMATCH threshold, num_yearsCLIM = ' + str(num_yearsCLIM) + ', year ' + str(i))
+                if not np.allclose(clim_mean[i], np.nanmean(window, axis=0), rtol=1e-12, atol=1e-12, equal_nan=True):
+                    n_bad += 1
+                    print('MISMATCH mean, num_yearsCLIM = ' + str(num_yearsCLIM) + ', year ' + str(i))
+            # year 0 = fixed baseline of the first num_yearsCLIM years
+            thresh_fixed, mean_fixed = heatwave_functions_G.clim_calcs(field, num_yearsCLIM, pctile)
+        if not np.array_equal(clim_thresh[0], thresh_fixed, equal_nan=True):
+            n_bad += 1
+            print('MISMATCH threshold vs clim_calcs(), num_yearsCLIM = ' + str(num_yearsCLIM))
+        if not np.allclose(clim_mean[0], mean_fixed, rtol=1e-12, atol=1e-12, equal_nan=True):
+            n_bad += 1
+            print('MISMATCH mean vs clim_calcs(), num_yearsCLIM = ' + str(num_yearsCLIM))
+        print('num_yearsCLIM = ' + str(num_yearsCLIM) + ': checked ' + str(num_years) + ' years')
+
+    return n_bad
+
+#****************************************************************
+
+if __name__ == '__main__':
+    n_bad = run_checks()
+    print('all rolling climatologies match' if n_bad == 0 else str(n_bad) + ' mismatches')
+    raise SystemExit(n_bad > 0)
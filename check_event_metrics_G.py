@@ -0,0 +1,124 @@
+'''
+
+Check of event_metrics() (heatwave_functions_G.py) against the previous per-event MHW metric calculations of mhw_metrics().
+
+Every metric of every event must match exactly, for the NumPy fallback and the loop kernel (compiled with numba if it is installed).
+Run with: python check_event_metrics_G.py (e.g. after upgrading NumPy, as exact agreement relies on NumPy's summation order)
+
+'''
+
+#****************************************************************
+
+import numpy as np
+import scipy.ndimage as ndimage
+import heatwave_functions_G
+
+#****************************************************************
+
+def reference_metrics(temp, thresh, seas, starts, ends):
+
+    ''' original per-event calculations from mhw_metrics(), one event at a time '''
+
+    mhw = {}
+    for key in ['time_peak', 'duration', 'duration_moderate', 'duration_strong', 'duration_severe', 'duration_extreme', 'category']:
+        mhw[key] = []
+    for suffix in ['', '_relThresh', '_abs']:
+        for metric in ['max', 'mean', 'var', 'cumulative']:
+            mhw['intensity_' + metric + suffix] = []
+    categories = np.array(['Moderate', 'Strong', 'Severe', 'Extreme'])
+    for tt_start, tt_end in zip(starts, ends):
+        temp_mhw = temp[tt_start:tt_end+1]
+        thresh_mhw = thresh[tt_start:tt_end+1]
+        seas_mhw = seas[tt_start:tt_end+1]
+        mhw_relSeas = temp_mhw - seas_mhw
+        mhw_relThresh = temp_mhw - thresh_mhw
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mhw_relThreshNorm = (temp_mhw - thresh_mhw) / (thresh_mhw - seas_mhw)
+        mhw_abs = temp_mhw
+        tt_peak = np.argmax(mhw_relSeas)
+        mhw['time_peak'].append(tt_start + tt_peak)
+        mhw['duration'].append(len(mhw_relSeas))
+        for suffix, series in [('', mhw_relSeas), ('_relThresh', mhw_relThresh), ('_abs', mhw_abs)]:
+            mhw['intensity_max' + suffix].append(series[tt_peak])
+            mhw['intensity_mean' + suffix].append(series.mean())
+            mhw['intensity_var' + suffix].append(np.sqrt(series.var()))
+            mhw['intensity_cumulative' + suffix].append(series.sum())
+        tt_peakCat = np.argmax(mhw_relThreshNorm)
+        cats = np.floor(1. + mhw_relThreshNorm)
+        mhw['category'].append(categories[np.min([cats[tt_peakCat], 4]).astype(int) - 1])
+        mhw['duration_moderate'].append(np.sum(cats == 1.))
+        mhw['duration_strong'].append(np.sum(cats == 2.))
+        mhw['duration_severe'].append(np.sum(cats == 3.))
+        mhw['duration_extreme'].append(np.sum(cats >= 4.))
+
+    return mhw
+
+def find_events(temp, thresh, min_duration=5):
+
+    ''' start/end time indices of threshold exceedances of at least 'min_duration' days, as in mhw_metrics() '''
+
+    events, n_events = ndimage.label(temp > thresh)
+    starts = []
+    ends = []
+    for ev in range(1, n_events + 1):
+        where_ev = np.where(events == ev)[0]
+        if len(where_ev) >= min_duration:
+            starts.append(where_ev[0])
+            ends.append(where_ev[-1])
+
+    return starts, ends
+
+def test_cases():
+
+    ''' (name, temp, thresh, seas) test grid cells '''
+
+    days_in_year = 365
+    num_years = 6
+    rng = np.random.default_rng(0)
+    cases = []
+    # random SST with seasonal cycle; events of all lengths (incl. > 128 days, i.e. more than one pairwise summation block)
+    t = np.arange(num_years * days_in_year)
+    seas = np.tile(15. + 3. * np.sin(2 * np.pi * np.arange(days_in_year) / days_in_year), num_years)
+    thresh = seas + rng.uniform(0.5, 1.5, days_in_year)[t % days_in_year]
+    for cell in range(12):
+        temp = seas + np.cumsum(rng.normal(0., 0.3, len(t))) * 0.1 + rng.normal(0., 0.5, len(t)) * (cell % 3)
+        cases.append(('random ' + str(cell), temp, thresh, seas))
+    # ice-covered cell: thresh == seas (division by zero in relThreshNorm -> 'Extreme')
+    temp = np.full(num_years * days_in_year, -1.8)
+    temp[100:110] = np.linspace(-1.5, -0.5, 10)
+    ice = np.full(num_years * days_in_year, -1.8)
+    cases.append(('ice (thresh == seas)', temp, ice, ice.copy()))
+
+    return cases
+
+def run_checks():
+
+    ''' compare every event metric with the reference on each available path; returns number of mismatches '''
+
+    paths = [('numpy fallback', False)]
+    paths.append(('numba loop' if heatwave_functions_G.HAVE_NUMBA else 'loop (not compiled, numba not installed)', True))
+    have_numba = heatwave_functions_G.HAVE_NUMBA
+    n_bad = 0
+    for path, use_loop in paths:
+        heatwave_functions_G.HAVE_NUMBA = use_loop # event_metrics() uses the loop kernel when HAVE_NUMBA is True
+        n_events = 0
+        for name, temp, thresh, seas in test_cases():
+            starts, ends = find_events(temp, thresh)
+            ref = reference_metrics(temp, thresh, seas, starts, ends)
+            metrics = heatwave_functions_G.event_metrics(temp, thresh, seas, starts, ends)
+            n_events += len(starts)
+            for key in ref:
+                if not np.array_equal(np.array(ref[key]), metrics[key]):
+                    n_bad += 1
+                    print('MISMATCH ' + path + ', ' + name + ': ' + key)
+        print(path + ': checked ' + str(n_events) + ' events')
+    heatwave_functions_G.HAVE_NUMBA = have_numba
+
+    return n_bad
+
+#****************************************************************
+
+if __name__ == '__main__':
+    n_bad = run_checks()
+    print('all event metrics match' if n_bad == 0 else str(n_bad) + ' mismatches')
+    raise SystemExit(n_bad > 0)
@@ -0,0 +1,125 @@
+'''
+
+Check of mhw_region_stats() (heatwave_functions_G.py) against straightforward per-region mask sums.
+
+Area, area-weighted mean intensity and MHW onset counts of every region must match, daily and yearly, with negative and masked region labels, grid cells without MHWs,
+missing SST on MHW days and both a [365, lat, lon] and a year-indexed [num_years, 365, lat, lon] clim_mean.
+Run with: python check_region_stats_G.py
+
+'''
+
+#****************************************************************
+
+import io
+import os
+import contextlib
+import tempfile
+import numpy as np
+import heatwave_functions_G
+
+#****************************************************************
+
+def test_data(num_years, n_lat, n_lon):
+
+    ''' SST field, heatwaves (time_start/time_end only, as used by mhw_region_stats()), grid cell area [m2] and region labels '''
+
+    days_in_year = 365
+    rng = np.random.default_rng(0)
+    t = np.arange(num_years * days_in_year) + 0.5 # time values, not indices
+    field = rng.normal(15., 2., (num_years * days_in_year, n_lat, n_lon))
+    field[rng.random(np.shape(field)) < 0.05] = np.nan # missing SST, incl. on MHW days
+    grid_area = rng.uniform(5e8, 8e8, (n_lat, n_lon))
+    regions = np.ma.masked_array(rng.integers(-1, 4, (n_lat, n_lon)), mask=rng.random((n_lat, n_lon)) < 0.15) # -1 and masked = no region
+    heatwaves = []
+    for grid in range(n_lat * n_lon):
+        mhw = {'time_start': [], 'time_end': []}
+        n_events = 0 if grid % 5 == 0 else rng.integers(1, 6) # some grid cells without MHWs
+        starts = np.sort(rng.choice(np.arange(0, len(t) - 40, 40), n_events, replace=False))
+        for tt_start in starts:
+            mhw['time_start'].append(t[tt_start])
+            mhw['time_end'].append(t[tt_start + rng.integers(4, 39)])
+        heatwaves.append(mhw)
+
+    return field, heatwaves, grid_area, regions, t
+
+def reference_stats(heatwaves, field, clim_mean, grid_area, regions, years, t):
+
+    ''' per-region mask sums over a [time, lat, lon] array of MHW conditions '''
+
+    days_in_year = 365
+    t_len = years * days_in_year
+    n_lat, n_lon = np.shape(grid_area)
+    labels = np.ma.filled(regions, -1)
+    area_km = grid_area / 1000000
+    if np.ndim(clim_mean) == 4:
+        seas = np.reshape(clim_mean[0:years], (t_len, n_lat, n_lon))
+    else:
+        seas = np.tile(clim_mean, (years, 1, 1))
+    intensity = field[0:t_len] - seas
+    in_mhw = np.zeros((t_len, n_lat, n_lon), dtype=bool)
+    onset = np.zeros((t_len, n_lat, n_lon))
+    for grid in range(len(heatwaves)):
+        x = grid // n_lon
+        y = grid % n_lon
+        for time_start, time_end in zip(heatwaves[grid]['time_start'], heatwaves[grid]['time_end']):
+            tt_start = np.where(t == time_start)[0][0]
+            tt_end = np.where(t == time_end)[0][0]
+            in_mhw[tt_start:tt_end+1, x, y] = True
+            onset[tt_start, x, y] += 1
+    n_regions = labels.max() + 1
+    stats = {}
+    for key in ['area', 'intensity_mean', 'n_events']:
+        stats[key] = np.zeros((n_regions, t_len))
+    for key in ['area_yearly', 'intensity_mean_yearly', 'n_events_yearly']:
+        stats[key] = np.zeros((n_regions, years))
+    for r in range(n_regions):
+        mask = labels == r
+        area = np.array([np.sum(area_km[mask & in_mhw[i]]) for i in range(t_len)])
+        valid = [mask & in_mhw[i] & ~np.isnan(intensity[i]) for i in range(t_len)]
+        area_valid = np.array([np.sum(area_km[valid[i]]) for i in range(t_len)])
+        area_intensity = np.array([np.sum(area_km[valid[i]] * intensity[i][valid[i]]) for i in range(t_len)])
+        stats['area'][r] = area
+        stats['n_events'][r] = [np.sum(onset[i][mask]) for i in range(t_len)]
+        stats['intensity_mean'][r] = [area_intensity[i] / area_valid[i] if area_valid[i] > 0 else np.nan for i in range(t_len)]
+        for yr in range(years):
+            days = slice(yr * days_in_year, (yr + 1) * days_in_year)
+            stats['area_yearly'][r, yr] = np.sum(area[days])
+            stats['n_events_yearly'][r, yr] = np.sum(stats['n_events'][r, days])
+            stats['intensity_mean_yearly'][r, yr] = np.sum(area_intensity[days]) / np.sum(area_valid[days]) if np.sum(area_valid[days]) > 0 else np.nan
+
+    return stats
+
+def run_checks():
+
+    ''' compare mhw_region_stats() with reference_stats() for both climatology shapes; returns number of mismatches '''
+
+    days_in_year = 365
+    num_years = 3
+    field, heatwaves, grid_area, regions, t = test_data(num_years, 6, 7)
+    rng = np.random.default_rng(1)
+    clim_3d = rng.normal(14., 1., (days_in_year, 6, 7))
+    clim_4d = rng.normal(14., 1., (num_years, days_in_year, 6, 7))
+    n_bad = 0
+    for name, clim_mean in [('clim_mean [365, lat, lon]', clim_3d), ('clim_mean [num_years, 365, lat, lon]', clim_4d)]:
+        with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(io.StringIO()):
+            cwd = os.getcwd()
+            os.chdir(tmp) # mhw_region_stats() saves region_stats.npz to the working directory
+            try:
+                stats = heatwave_functions_G.mhw_region_stats(heatwaves, field, clim_mean, grid_area, regions, num_years, t)
+            finally:
+                os.chdir(cwd)
+        ref = reference_stats(heatwaves, field, clim_mean, grid_area, regions, num_years, t)
+        for key in ref:
+            if np.shape(stats[key]) != np.shape(ref[key]) or not np.allclose(stats[key], ref[key], rtol=1e-12, atol=1e-9, equal_nan=True):
+                n_bad += 1
+                print('MISMATCH ' + name + ': ' + key)
+        print(name + ': checked ' + str(len(ref['area'])) + ' regions, ' + str(int(np.sum(ref['n_events']))) + ' MHWs')
+
+    return n_bad
+
+#****************************************************************
+
+if __name__ == '__main__':
+    n_bad = run_checks()
+    print('all region statistics match' if n_bad == 0 else str(n_bad) + ' mismatches')
+    raise SystemExit(n_bad > 0)
@@ -60,8 +60,10 @@ grid_area = fileobj.variables['cell_area'][:]
 
 # general heatwaves
 clim_thresh, clim_mean = heatwave_functions_G.clim_calcs(temperature, num_yearsCLIM, pctile)
+# clim_thresh, clim_mean = heatwave_functions_G.clim_calcs_rolling(temperature, num_yearsCLIM, pctile) # alternative: trailing 'num_yearsCLIM' year baseline for each year (non-stationary); year-indexed output accepted by mhw_metrics() and eddy_census_calc()
 heatwaves = heatwave_functions_G.mhw_metrics(temperature, clim_thresh, clim_mean, lat, lon, t)
 area, area_yearly = heatwave_functions_G.mhw_area(heatwaves, grid_area, num_years, t)
+# region_stats = heatwave_functions_G.mhw_region_stats(heatwaves, temperature, clim_mean, grid_area, regions, num_years, t) # per-region statistics; 'regions' = integer label mask (lat, lon) on the grid_area grid
 
 # eddyHeatwaves
 
@@ -33,7 +33,7 @@ def eddy_census_calc(eddies_tracked, field, lon, lat, clim_mean, spat_res):
     field = SST dataset in array format of shape e.g. temperature[time,lat,lon] where time is a multiple of 365 (i.e. complete years)
     lat = array of latitude values corresponding to 'field'
     lon = array of longitude values corresponding to 'field'
-    clim_mean = mean SST value for each grid cell across each day of the year
+    clim_mean = mean SST value for each grid cell across each day of the year [365, lat, lon] from clim_calcs(), or year-indexed [num_years, 365, lat, lon] from clim_calcs_rolling()
     spat_res = model spatial resolution (adjust as necessary) [degrees]; ideally 0.25 (eddy-permitting) or higher
     
     OUTPUT:
@@ -145,8 +145,12 @@ def eddy_census_calc(eddies_tracked, field, lon, lat, clim_mean, spat_res):
     eddies_a = []
     eddies_c = []
     
-    baseline_mean_int = [clim_mean,] * num_years
-    baseline_mean = np.reshape(baseline_mean_int, (num_years * days_in_year, len(lat), len(lon)))
+    if np.ndim(clim_mean) == 4:
+        # year-indexed (rolling) climatology from clim_calcs_rolling()
+        baseline_mean = np.reshape(clim_mean[0:num_years], (num_years * days_in_year, len(lat), len(lon)))
+    else:
+        baseline_mean_int = [clim_mean,] * num_years
+        baseline_mean = np.reshape(baseline_mean_int, (num_years * days_in_year, len(lat), len(lon)))
     
     # further split into anticylonic and cyclonic datasets
     for ed in range(len(eddies)):
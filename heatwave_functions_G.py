@@ -11,6 +11,13 @@ Jamie Atkins
 import numpy as np
 import scipy.ndimage as ndimage
 
+# numba is optional; without it event_metrics() falls back to segmented NumPy reductions
+try:
+    from numba import njit
+    HAVE_NUMBA = True
+except ImportError:
+    HAVE_NUMBA = False
+
 #****************************************************************
 
 ###############################################
@@ -76,6 +83,330 @@ def clim_calcs(field, num_yearsCLIM, pctile):
     
     return clim_thresh, clim_mean
 
+###########################################################
+
+### ROLLING (NON-STATIONARY) MEAN/THRESHOLD CLIMATOLOGY ###
+
+###########################################################
+
+def _window_percentile(window, n_valid, pctile):
+
+    ''' linear-interpolation percentile (as np.nanpercentile) of a window sorted along axis 0 with NaNs stored as +inf at the end; n_valid = number of non-NaN values '''
+
+    rank = pctile / 100. * (n_valid - 1)
+    lo = np.clip(np.floor(rank), 0, None).astype(int)
+    hi = np.minimum(lo + 1, np.maximum(n_valid - 1, 0))
+    gamma = rank - lo
+    a = np.take_along_axis(window, lo[np.newaxis], axis=0)[0]
+    b = np.take_along_axis(window, hi[np.newaxis], axis=0)[0]
+    with np.errstate(invalid='ignore'):
+        diff = b - a
+        thresh = np.where(gamma >= 0.5, b - diff * (1 - gamma), a + diff * gamma)
+    thresh[n_valid == 0] = np.nan
+
+    return thresh
+
+def _window_slide(window, drop, add):
+
+    ''' remove one value ('drop') from and insert one value ('add') into each column of a window sorted along axis 0, keeping it sorted '''
+
+    size = window.shape[0]
+    k = np.arange(size - 1).reshape((-1,) + (1,) * (window.ndim - 1))
+    # remove the first occurrence of 'drop'
+    pos_drop = np.argmax(window == drop, axis=0)
+    kept = np.where(k < pos_drop, window[:-1], window[1:])
+    # insert 'add' in sorted position
+    k = np.arange(size).reshape((-1,) + (1,) * (window.ndim - 1))
+    pos_add = np.sum(kept < add, axis=0)
+    pad = np.full((1,) + add.shape, np.inf)
+    window = np.where(k < pos_add, np.concatenate((kept, pad)), np.concatenate((pad, kept)))
+    window = np.where(k == pos_add, add, window)
+
+    return window
+
+def clim_calcs_rolling(field, num_yearsCLIM, pctile):
+
+    '''
+
+    Heatwave analysis with a non-stationary (moving) baseline.
+
+    function to calculate the mean and specified threshold value for each grid cell across each day of a year over a trailing climatological window of 'num_yearsCLIM' years for each year of 'field', where:
+    the window for year i covers years i - num_yearsCLIM + 1 to i; years before the first full window use the first 'num_yearsCLIM' years (i.e. the same baseline as clim_calcs()).
+    Statistics are updated incrementally as the window slides (one year added, one year dropped) from a per-cell, per-day sorted window and running sums, rather than recomputed from scratch for each year.
+
+    INPUT:
+    field = daily SST dataset in array format of shape e.g. temperature[time,lat,lon] where time is a multiple of 365 (i.e. complete years)
+    num_yearsCLIM = time length [years] of the trailing climatological mean/threshold window
+    pctile = specified percentile to compute
+
+    OUTPUT:
+    clim_thresh = 4D array (of shape [num_years, 365, len(lat), len(lon)] of threshold percentile SST for each grid cell calculated for each day of the year across the window of each year
+    clim_mean = 4D array (of shape [num_years, 365, len(lat), len(lon)] of mean SST for each grid cell averaged for each day of the year across the window of each year
+    *** both may be passed to mhw_metrics() in place of the 3D output of clim_calcs() ***
+
+    '''
+
+    print('Starting clim_calcs_rolling():')
+
+    days_in_year = 365
+    num_years = int(len(field) / days_in_year) # number of years in analysis period
+    sst = np.ma.filled(np.ma.asarray(field[0:num_years * days_in_year], dtype=float), np.nan)
+    sst = np.reshape(sst, (num_years, days_in_year) + np.shape(sst)[1:]) # [year, day, lat, lon]
+    clim_thresh = np.zeros(np.shape(sst))
+    clim_mean = np.zeros(np.shape(sst))
+
+    # first window, sorted along the year axis with missing values (NaN) stored as +inf at the end
+    window = np.sort(np.where(np.isnan(sst[0:num_yearsCLIM]), np.inf, sst[0:num_yearsCLIM]), axis=0)
+    n_valid = np.sum(~np.isnan(sst[0:num_yearsCLIM]), axis=0)
+    sst_sum = np.nansum(sst[0:num_yearsCLIM], axis=0)
+
+    for i in range(num_years):
+        print(str(i) + ' of ' + str(num_years - 1))
+        if i >= num_yearsCLIM:
+            # slide window: drop the oldest year, add year i
+            drop = sst[i - num_yearsCLIM]
+            add = sst[i]
+            window = _window_slide(window, np.where(np.isnan(drop), np.inf, drop), np.where(np.isnan(add), np.inf, add))
+            n_valid = n_valid - ~np.isnan(drop) + ~np.isnan(add)
+            sst_sum = sst_sum - np.nan_to_num(drop) + np.nan_to_num(add)
+        clim_thresh[i] = _window_percentile(window, n_valid, pctile)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            clim_mean[i] = np.where(n_valid > 0, sst_sum / n_valid, np.nan)
+
+    return clim_thresh, clim_mean
+
+###############################
+
+### PER-EVENT METRICS KERNEL ###
+
+###############################
+
+def _pairwise_sum(a, lo, n):
+
+    ''' sum of a[lo:lo+n] in the same order as NumPy's pairwise summation of float64 arrays (ndarray.sum/mean/var), so compiled results match NumPy exactly
+    mirrors @TYPE@_pairwise_sum in numpy/_core/src/umath/loops_utils.h.src (8-way unrolled blocks of up to PW_BLOCKSIZE = 128 elements, split rule n2 = n / 2 rounded down to a multiple of 8); checked against NumPy 2.4
+    N.B. this copies NumPy internals; if NumPy changes its summation order results will differ in the last bits without error, run check_event_metrics_G.py after upgrading NumPy '''
+
+    if n < 8:
+        res = -0.
+        for i in range(lo, lo + n):
+            res += a[i]
+        return res
+    elif n <= 128:
+        r0 = a[lo]
+        r1 = a[lo + 1]
+        r2 = a[lo + 2]
+        r3 = a[lo + 3]
+        r4 = a[lo + 4]
+        r5 = a[lo + 5]
+        r6 = a[lo + 6]
+        r7 = a[lo + 7]
+        i = 8
+        while i < n - (n % 8):
+            r0 += a[lo + i]
+            r1 += a[lo + i + 1]
+            r2 += a[lo + i + 2]
+            r3 += a[lo + i + 3]
+            r4 += a[lo + i + 4]
+            r5 += a[lo + i + 5]
+            r6 += a[lo + i + 6]
+            r7 += a[lo + i + 7]
+            i += 8
+        res = ((r0 + r1) + (r2 + r3)) + ((r4 + r5) + (r6 + r7))
+        while i < n:
+            res += a[lo + i]
+            i += 1
+        return res
+    n2 = n // 2
+    n2 -= n2 % 8
+    return _pairwise_sum(a, lo, n2) + _pairwise_sum(a, lo + n2, n - n2)
+
+def _segmented_pairwise_sum(x, offsets, lengths):
+
+    ''' _pairwise_sum() of every segment x[offsets[i]:offsets[i]+lengths[i]] at once; loops run over positions within a block (at most 128), not over segments '''
+
+    total = np.full(len(offsets), -0.)
+    last = len(x) - 1
+    # segments of fewer than 8 values: sequential sum
+    short = lengths < 8
+    for k in range(7):
+        add = short & (k < lengths)
+        total = np.where(add, total + x[np.minimum(offsets + k, last)], total)
+    # segments of 8 to 128 values: 8 accumulators, combined pairwise, then the remainder sequentially
+    block = (lengths >= 8) & (lengths <= 128)
+    if block.any():
+        off = offsets[block]
+        n = lengths[block]
+        n_blocked = n - n % 8
+        r = [x[off + j] for j in range(8)]
+        for i in range(8, n_blocked.max(), 8):
+            add = i < n_blocked
+            for j in range(8):
+                r[j] = np.where(add, r[j] + x[np.minimum(off + i + j, last)], r[j])
+        res = ((r[0] + r[1]) + (r[2] + r[3])) + ((r[4] + r[5]) + (r[6] + r[7]))
+        for k in range(7):
+            add = k < n % 8
+            res = np.where(add, res + x[np.minimum(off + n_blocked + k, last)], res)
+        total[block] = res
+    # segments of more than 128 values: split in two and sum each half
+    long = lengths > 128
+    if long.any():
+        n2 = lengths[long] // 2
+        n2 -= n2 % 8
+        total[long] = _segmented_pairwise_sum(x, offsets[long], n2) + _segmented_pairwise_sum(x, offsets[long] + n2, lengths[long] - n2)
+
+    return total
+
+def _event_metrics_numpy(temp, thresh, seas, starts, ends):
+
+    ''' segmented NumPy reductions over all events of a single grid cell (sums by _segmented_pairwise_sum(), peaks and category days by np.maximum/minimum/add.reduceat); fallback for when numba is not installed '''
+
+    lengths = ends - starts + 1
+    offsets = np.cumsum(lengths) - lengths # start of each event in the gathered (concatenated) arrays
+    local = np.arange(lengths.sum()) - np.repeat(offsets, lengths) # position of each day within its event
+    idx = np.repeat(starts, lengths) + local # time index of each day of every event
+
+    temp_ev = temp[idx]
+    thresh_ev = thresh[idx]
+    seas_ev = seas[idx]
+    series = (temp_ev - seas_ev, temp_ev - thresh_ev, temp_ev) # relSeas, relThresh, abs
+    with np.errstate(divide='ignore', invalid='ignore'):
+        relThreshNorm = (temp_ev - thresh_ev) / (thresh_ev - seas_ev) # inf where thresh == seas, as in mhw_metrics()
+
+    def seg_argmax(x):
+        # first index of the maximum within each event (as np.argmax, i.e. the first NaN if there is one)
+        x_max = np.repeat(np.maximum.reduceat(x, offsets), lengths)
+        is_max = (x == x_max) | (np.isnan(x) & np.isnan(x_max))
+        return np.minimum.reduceat(np.where(is_max, local, lengths.max()), offsets)
+
+    tt_peak = seg_argmax(series[0])
+    out = np.zeros((4, 3, len(starts)))
+    for s in range(3):
+        x = series[s]
+        # pairwise rather than np.add.reduceat (sequential) sums, to match ndarray.sum/mean/var exactly
+        total = _segmented_pairwise_sum(x, offsets, lengths)
+        mean = total / lengths
+        dev = x - np.repeat(mean, lengths)
+        out[0, s] = x[offsets + tt_peak]
+        out[1, s] = mean
+        out[2, s] = np.sqrt(_segmented_pairwise_sum(dev * dev, offsets, lengths) / lengths)
+        out[3, s] = total
+
+    cats = np.floor(1. + relThreshNorm)
+    cat_peak = np.minimum(cats[offsets + seg_argmax(relThreshNorm)], 4).astype(int) - 1
+    cat_days = np.zeros((4, len(starts)), dtype=int)
+    for c in range(3):
+        cat_days[c] = np.add.reduceat((cats == c + 1.).astype(int), offsets)
+    cat_days[3] = np.add.reduceat((cats >= 4.).astype(int), offsets)
+
+    return tt_peak, out, cat_peak, cat_days
+
+def _event_metrics_loop(temp, thresh, seas, starts, ends):
+
+    ''' single loop over the events of a single grid cell (compiled with numba when available); same arithmetic as _event_metrics_numpy() '''
+
+    n_ev = len(starts)
+    tt_peak = np.zeros(n_ev, dtype=np.int64)
+    out = np.zeros((4, 3, n_ev))
+    cat_peak = np.zeros(n_ev, dtype=np.int64)
+    cat_days = np.zeros((4, n_ev), dtype=np.int64)
+    for ev in range(n_ev):
+        n = ends[ev] - starts[ev] + 1
+        relSeas = temp[starts[ev]:ends[ev] + 1] - seas[starts[ev]:ends[ev] + 1]
+        relThresh = temp[starts[ev]:ends[ev] + 1] - thresh[starts[ev]:ends[ev] + 1]
+        mhw_abs = temp[starts[ev]:ends[ev] + 1].copy()
+        relThreshNorm = relThresh / (thresh[starts[ev]:ends[ev] + 1] - seas[starts[ev]:ends[ev] + 1])
+        # peaks (first maximum, or first NaN, as np.argmax) and category days
+        peak = 0
+        peak_norm = 0
+        for k in range(n):
+            if not np.isnan(relSeas[peak]) and (relSeas[k] > relSeas[peak] or np.isnan(relSeas[k])):
+                peak = k
+            if not np.isnan(relThreshNorm[peak_norm]) and (relThreshNorm[k] > relThreshNorm[peak_norm] or np.isnan(relThreshNorm[k])):
+                peak_norm = k
+            cat = np.floor(1. + relThreshNorm[k])
+            if cat >= 4.:
+                cat_days[3, ev] += 1
+            elif cat >= 1.:
+                cat_days[int(cat) - 1, ev] += 1
+        tt_peak[ev] = peak
+        cat_peak[ev] = int(min(np.floor(1. + relThreshNorm[peak_norm]), 4.)) - 1
+        # sums, means and standard deviations (as ndarray.sum/mean/var)
+        for s in range(3):
+            if s == 0:
+                x = relSeas
+            elif s == 1:
+                x = relThresh
+            else:
+                x = mhw_abs
+            total = _pairwise_sum(x, 0, n)
+            mean = total / n
+            dev = x - mean
+            out[0, s, ev] = x[peak]
+            out[1, s, ev] = mean
+            out[2, s, ev] = np.sqrt(_pairwise_sum(dev * dev, 0, n) / n)
+            out[3, s, ev] = total
+
+    return tt_peak, out, cat_peak, cat_days
+
+if HAVE_NUMBA:
+    # error_model='numpy' so that division by zero (e.g. thresh == seas in ice-covered cells) gives inf/NaN as in NumPy rather than raising ZeroDivisionError
+    # N.B. no cache=True; numba cannot reload the recursive _pairwise_sum from its cache
+    _pairwise_sum = njit(error_model='numpy')(_pairwise_sum)
+    _event_metrics_loop = njit(error_model='numpy')(_event_metrics_loop)
+
+def event_metrics(temp, thresh, seas, starts, ends):
+
+    '''
+
+    Per-event MHW metrics for every event of a single grid cell in one pass.
+
+    Computed in a single compiled loop over all events when numba is available, otherwise with segmented NumPy reductions.
+    Results match the previous per-event calculations of mhw_metrics() in this repository (based on Eric Oliver marineHeatwaves) exactly for float64 input; inputs are converted to float64.
+    Exact agreement relies on reproducing NumPy's pairwise summation order (see _pairwise_sum(), checked against NumPy 2.4).
+    See check_event_metrics_G.py for a comparison against the per-event calculations.
+
+    INPUT:
+    temp = 1D array of SST for the grid cell [time]
+    thresh = 1D array of threshold SST for the grid cell, same length as 'temp'
+    seas = 1D array of mean (seasonal) SST for the grid cell, same length as 'temp'
+    starts = 1D integer array of time indices at which each event starts
+    ends = 1D integer array of time indices at which each event ends (inclusive)
+
+    OUTPUT:
+    metrics = dictionary of 1D arrays (one value per event) keyed as in mhw_metrics(): 'time_peak' [index], 'duration', 'duration_moderate/strong/severe/extreme', 'intensity_max/mean/var/cumulative' (+ '_relThresh', '_abs') and 'category'
+
+    '''
+
+    temp = np.asarray(temp, dtype=float)
+    thresh = np.asarray(thresh, dtype=float)
+    seas = np.asarray(seas, dtype=float)
+    starts = np.asarray(starts, dtype=np.int64)
+    ends = np.asarray(ends, dtype=np.int64)
+
+    if len(starts) == 0:
+        tt_peak = np.zeros(0, dtype=int)
+        out = np.zeros((4, 3, 0))
+        cat_peak = np.zeros(0, dtype=int)
+        cat_days = np.zeros((4, 0), dtype=int)
+    elif HAVE_NUMBA:
+        tt_peak, out, cat_peak, cat_days = _event_metrics_loop(temp, thresh, seas, starts, ends)
+    else:
+        tt_peak, out, cat_peak, cat_days = _event_metrics_numpy(temp, thresh, seas, starts, ends)
+
+    categories = np.array(['Moderate', 'Strong', 'Severe', 'Extreme'])
+    metrics = {}
+    metrics['time_peak'] = starts + tt_peak
+    metrics['duration'] = ends - starts + 1
+    for c, cat in enumerate(['moderate', 'strong', 'severe', 'extreme']):
+        metrics['duration_' + cat] = cat_days[c]
+    for s, suffix in enumerate(['', '_relThresh', '_abs']):
+        for m, metric in enumerate(['max', 'mean', 'var', 'cumulative']):
+            metrics['intensity_' + metric + suffix] = out[m, s]
+    metrics['category'] = categories[cat_peak]
+
+    return metrics
+
 ###############################
 
 ### MARINE HEATWAVE METRICS ###
@@ -93,8 +424,9 @@ def mhw_metrics(field, clim_thresh, clim_mean, lat, lon, t):
 
     INPUT:
     field = SST dataset in array format of shape e.g. temperature[time,lat,lon] where time is a multiple of 365 (i.e. complete years)
-    baseline_thresh = SST array of threshold values at a certain percentile for each time step and grid cell , calculated in clim_calc function
-    baseline_mean = as above but mean values
+    clim_thresh = SST array of threshold values at a certain percentile for each day of the year and grid cell, calculated in clim_calcs function [365, lat, lon]
+        or year-indexed [num_years, 365, lat, lon] as calculated in clim_calcs_rolling function
+    clim_mean = as above but mean values
     lat = array of latitude values corresponding to 'field'
     lon = array of longitude values corresponding to 'field'
     t = array of time values corresponding to 'field' 
@@ -111,12 +443,16 @@ def mhw_metrics(field, clim_thresh, clim_mean, lat, lon, t):
     heatwaves = [] # create empty heatwaves list
     days_in_year = 365 # number of days in a year
     num_years = int(len(field) / days_in_year) # number of years in analysis period
-    # repeat clim_mean for number of years in climatological period so compatible with 'field'
-    baseline_mean_int = [clim_mean,] * num_years
-    baseline_mean = np.reshape(baseline_mean_int, (num_years * days_in_year, len(lat), len(lon))) 
-    # repeat clim_thresh for number of years in climatological period so compatible with 'field'
-    baseline_thresh_int = [clim_thresh,] * num_years
-    baseline_thresh = np.reshape(baseline_thresh_int, (num_years * days_in_year, len(lat), len(lon)))
+
+    def baseline_series(clim, x, y):
+
+        ''' threshold/mean time series of a single grid cell compatible with 'field'; clim_thresh/clim_mean are not expanded to full [time, lat, lon] arrays '''
+
+        if np.ndim(clim) == 4:
+            # year-indexed (rolling) climatology
+            return np.reshape(clim[0:num_years,:,x,y], num_years * days_in_year)
+        # repeat the climatology for number of years in analysis period
+        return np.tile(clim[:,x,y], num_years)
 
     for x in range(len(lat)):
         print(str(x) + ' of ' + str(len(lat)-1))
@@ -151,8 +487,11 @@ def mhw_metrics(field, clim_thresh, clim_mean, lat, lon, t):
             mhw['rate_onset'] = [] # [deg C / day]
             mhw['rate_decline'] = [] # [deg C / day]
 
+            baseline_thresh = baseline_series(clim_thresh, x, y)
+            baseline_mean = baseline_series(clim_mean, x, y)
+
             # find where temp exceeds threshold
-            exceed = field[:,x,y] - baseline_thresh[:,x,y]
+            exceed = field[:,x,y] - baseline_thresh
             exceed[exceed>0] = True
             exceed[exceed<=0] = False
             # label the events that exceed threshold
@@ -167,50 +506,19 @@ def mhw_metrics(field, clim_thresh, clim_mean, lat, lon, t):
                 mhw['time_start'].append(t[np.where(events == ev)[0][0]])
                 mhw['time_end'].append(t[np.where(events == ev)[0][-1]])
 
-            # calculate heatwave metrics
+            # calculate heatwave metrics (all events of the grid cell at once, see event_metrics())
             mhw['n_events'] = len(mhw['time_start'])
-            categories = np.array(['Moderate', 'Strong', 'Severe', 'Extreme'])
-            for ev in range(mhw['n_events']):
-                tt_start = np.where(t==mhw['time_start'][ev])[0][0]
-                tt_end = np.where(t==mhw['time_end'][ev])[0][0]
-                temp_mhw = field[tt_start:tt_end+1,x,y]
-                thresh_mhw = baseline_thresh[tt_start:tt_end+1,x,y]
-                seas_mhw = baseline_mean[tt_start:tt_end+1,x,y]
-                mhw_relSeas = temp_mhw - seas_mhw
-                mhw_relThresh = temp_mhw - thresh_mhw
-                mhw_relThreshNorm = (temp_mhw - thresh_mhw) / (thresh_mhw - seas_mhw)
-                mhw_abs = temp_mhw
+            if mhw['n_events'] > 0:
                 # lat and lon
                 mhw['lat_index'] = x
                 mhw['lon_index'] = y
                 mhw['lat'] = lat[x]
                 mhw['lon'] = lon[y]
-                # Find peak
-                tt_peak = np.argmax(mhw_relSeas)
-                mhw['time_peak'].append(tt_start + tt_peak)
-                # MHW Duration
-                mhw['duration'].append(len(mhw_relSeas))
-                # MHW Intensity metrics
-                mhw['intensity_max'].append(mhw_relSeas[tt_peak])
-                mhw['intensity_mean'].append(mhw_relSeas.mean())
-                mhw['intensity_var'].append(np.sqrt(mhw_relSeas.var()))
-                mhw['intensity_cumulative'].append(mhw_relSeas.sum())
-                mhw['intensity_max_relThresh'].append(mhw_relThresh[tt_peak])
-                mhw['intensity_mean_relThresh'].append(mhw_relThresh.mean())
-                mhw['intensity_var_relThresh'].append(np.sqrt(mhw_relThresh.var()))
-                mhw['intensity_cumulative_relThresh'].append(mhw_relThresh.sum())
-                mhw['intensity_max_abs'].append(mhw_abs[tt_peak])
-                mhw['intensity_mean_abs'].append(mhw_abs.mean())
-                mhw['intensity_var_abs'].append(np.sqrt(mhw_abs.var()))
-                mhw['intensity_cumulative_abs'].append(mhw_abs.sum())
-                # Fix categories
-                tt_peakCat = np.argmax(mhw_relThreshNorm)
-                cats = np.floor(1. + mhw_relThreshNorm)
-                mhw['category'].append(categories[np.min([cats[tt_peakCat], 4]).astype(int) - 1])
-                mhw['duration_moderate'].append(np.sum(cats == 1.))
-                mhw['duration_strong'].append(np.sum(cats == 2.))
-                mhw['duration_severe'].append(np.sum(cats == 3.))
-                mhw['duration_extreme'].append(np.sum(cats >= 4.))
+            tt_start = [np.where(t==mhw['time_start'][ev])[0][0] for ev in range(mhw['n_events'])]
+            tt_end = [np.where(t==mhw['time_end'][ev])[0][0] for ev in range(mhw['n_events'])]
+            metrics = event_metrics(field[:,x,y], baseline_thresh, baseline_mean, tt_start, tt_end)
+            for key in metrics:
+                mhw[key] = list(metrics[key])
 
             # ajoin to overall large dataset
             heatwaves.append(mhw)
@@ -305,3 +613,116 @@ def mhw_area(heatwaves, grid_area, years, t):
     np.savez('area_yearly', area_yearly = area_yearly)
     
     return area, area_yearly
+
+###################################
+
+ ### REGIONAL MHW STATISTICS ###
+
+###################################
+
+def mhw_region_stats(heatwaves, field, clim_mean, grid_area, regions, years, t):
+
+    '''
+
+    Function for calculating area-weighted MHW statistics for any number of sub-regions (e.g. basins, EEZs, marine protected areas) at once.
+
+    Every MHW day of every grid cell is assigned to a (region, timestep) bin and all regions are summed together with a single weighted np.bincount, so the cost does not depend on the number of regions.
+
+    INPUTS:
+    heatwaves = dataset of MHW metrics, from mhw_metrics()
+    field = SST dataset in array format of shape e.g. temperature[time,lat,lon], as passed to mhw_metrics()
+    clim_mean = mean SST climatology as passed to mhw_metrics(), from clim_calcs() [365, lat, lon] or clim_calcs_rolling() [num_years, 365, lat, lon]
+    grid_area = NetCDF file of the area (m2) of each grid cell within the analysis domain the format (lat, lon), as in mhw_area()
+    regions = integer array of region labels (0, 1, 2, ...) for each grid cell, same shape as 'grid_area'; grid cells with a negative (or masked) label are not assigned to any region
+    years = time length of analysis period [years]
+    t = array of timesteps in analysis period
+
+    OUTPUTS:
+    stats = dictionary of arrays of shape [region, time] (region index = label):
+        'area' = total area (km2) covered by MHW conditions at each timestep (MHW days from 'time_start' to 'time_end' inclusive)
+        'intensity_mean' = area-weighted mean intensity (SST - clim_mean) [deg C] of grid cells under MHW conditions at each timestep (NaN where no MHW)
+            N.B. MHW days with missing (NaN/masked) SST or clim_mean are left out of the intensity mean (but still count towards 'area'); NaN if all are missing
+        'n_events' = number of MHWs starting at each timestep
+        'area_yearly', 'intensity_mean_yearly', 'n_events_yearly' = as above in yearly bins [region, year] (cumulative area, area-weighted mean intensity, event count)
+
+    '''
+
+    print('Starting mhw_region_stats():')
+
+    # CONSTANTS
+    m2_to_km2_convert = 1000000 # conversion factor between m2 and km2
+    days_in_year = 365 # number of days in a year
+    t_len = years * days_in_year
+    n_lon = len(grid_area[0,:])
+    area_km = np.ravel(np.ma.filled(grid_area, 0.)) / m2_to_km2_convert
+    labels = np.ravel(np.ma.filled(regions, -1)).astype(int)
+    n_regions = labels.max() + 1
+
+    # TIME INDEX AND GRID CELL OF EVERY MHW DAY AND EVERY MHW ONSET
+    # N.B. grid cell index follows the order of 'heatwaves', i.e. grid = lat_index * len(lon) + lon_index
+    tt_mhw = [np.zeros(0, dtype=int)]
+    grid_mhw = [np.zeros(0, dtype=int)]
+    tt_onset = []
+    grid_onset = []
+    for grid in range(len(heatwaves)):
+        for ev in range(len(heatwaves[grid]['time_start'])):
+            tt_start = np.where(t==heatwaves[grid]['time_start'][ev])[0][0]
+            tt_end = np.where(t==heatwaves[grid]['time_end'][ev])[0][0]
+            tt_mhw.append(np.arange(tt_start, tt_end + 1))
+            grid_mhw.append(np.full(tt_end - tt_start + 1, grid))
+            tt_onset.append(tt_start)
+            grid_onset.append(grid)
+    tt_mhw = np.concatenate(tt_mhw)
+    grid_mhw = np.concatenate(grid_mhw)
+    tt_onset = np.array(tt_onset, dtype=int)
+    grid_onset = np.array(grid_onset, dtype=int)
+
+    # keep only grid cells within a region and timesteps within the analysis period
+    keep = (labels[grid_mhw] >= 0) & (tt_mhw < t_len)
+    tt_mhw = tt_mhw[keep]
+    grid_mhw = grid_mhw[keep]
+    keep = (labels[grid_onset] >= 0) & (tt_onset < t_len)
+    tt_onset = tt_onset[keep]
+    grid_onset = grid_onset[keep]
+
+    # MHW intensity (relative to the mean climatology) of each MHW day
+    x = grid_mhw // n_lon
+    y = grid_mhw % n_lon
+    if np.ndim(clim_mean) == 4:
+        seas = clim_mean[tt_mhw // days_in_year, tt_mhw % days_in_year, x, y]
+    else:
+        seas = clim_mean[tt_mhw % days_in_year, x, y]
+    intensity = np.ma.filled(field[tt_mhw, x, y], np.nan) - seas
+    valid = ~np.isnan(intensity) # missing values are left out of the intensity sums
+
+    # AREA-WEIGHTED SUMS FOR ALL REGIONS IN ONE PASS
+    # bin index = region * t_len + timestep, so the sums reshape directly to [region, time]
+    bins = labels[grid_mhw] * t_len + tt_mhw
+    area = np.bincount(bins, weights = area_km[grid_mhw], minlength = n_regions * t_len)
+    area_valid = np.bincount(bins[valid], weights = area_km[grid_mhw[valid]], minlength = n_regions * t_len)
+    area_intensity = np.bincount(bins[valid], weights = area_km[grid_mhw[valid]] * intensity[valid], minlength = n_regions * t_len)
+    n_events = np.bincount(labels[grid_onset] * t_len + tt_onset, minlength = n_regions * t_len)
+    area = np.reshape(area, (n_regions, t_len))
+    area_valid = np.reshape(area_valid, (n_regions, t_len))
+    area_intensity = np.reshape(area_intensity, (n_regions, t_len))
+    n_events = np.reshape(n_events, (n_regions, t_len))
+
+    # yearly bins
+    area_yearly = np.sum(np.reshape(area, (n_regions, years, days_in_year)), axis = 2)
+    area_valid_yearly = np.sum(np.reshape(area_valid, (n_regions, years, days_in_year)), axis = 2)
+    area_intensity_yearly = np.sum(np.reshape(area_intensity, (n_regions, years, days_in_year)), axis = 2)
+    n_events_yearly = np.sum(np.reshape(n_events, (n_regions, years, days_in_year)), axis = 2)
+
+    stats = {}
+    stats['area'] = area
+    stats['n_events'] = n_events
+    stats['area_yearly'] = area_yearly
+    stats['n_events_yearly'] = n_events_yearly
+    with np.errstate(invalid='ignore', divide='ignore'):
+        stats['intensity_mean'] = np.where(area_valid > 0, area_intensity / area_valid, np.nan)
+        stats['intensity_mean_yearly'] = np.where(area_valid_yearly > 0, area_intensity_yearly / area_valid_yearly, np.nan)
+
+    # SAVE OUTPUT
+    np.savez('region_stats', **stats)
+
+    return stats